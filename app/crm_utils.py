@@ -1,9 +1,12 @@
 from dotenv import load_dotenv
 from openai import OpenAI
 import json, time, re, os
-from io import StringIO
+from io import StringIO, BytesIO
 from datetime import datetime
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import editdistance
 import logging
 
 
@@ -12,6 +15,396 @@ import logging
 load_dotenv()
 client = OpenAI(default_headers={"OpenAI-Beta": "assistants=v2"})
 
+# Typed schema of the lead database, stored as a compressed parquet blob
+LEAD_SCHEMA = pa.schema([
+    ('contact_name', pa.string()),
+    ('message', pa.string()),
+    ('contact_date', pa.date32()),
+    ('followup_date', pa.date32()),
+    ('followup_time', pa.string()),
+    ('reminder_sent', pa.bool_()),
+    ('medium', pa.string()),
+    ('p_success', pa.float64()),
+    ('payoff', pa.float64()),
+    ('weighted_payoff', pa.float64()),
+])
+LEAD_HEADERS = LEAD_SCHEMA.names
+
+def coerce_leads(db):
+    """
+    Cast a lead table to the dtypes of LEAD_SCHEMA.
+    Dates given as 'DD-MM-YYYY' strings (Lead objects and legacy csv files) are parsed once here,
+    so that the stored table can be filtered on dates without any string parsing.
+
+    Parameters:
+    - db (pd.DataFrame): Table with (a subset of) the LEAD_HEADERS columns
+
+    Returns:
+    A DataFrame with exactly the LEAD_HEADERS columns, in order
+    """
+    db = db.reindex(columns=LEAD_HEADERS)
+    for key in ['contact_name', 'message', 'followup_time', 'medium']:
+        db[key] = db[key].astype('string')
+    for key in ['contact_date', 'followup_date']:
+        if not pd.api.types.is_datetime64_any_dtype(db[key]):
+            db[key] = pd.to_datetime(db[key], format='%d-%m-%Y', errors='coerce')
+    # Legacy csv files store the flag as 'True'/'False' strings
+    db['reminder_sent'] = db['reminder_sent'].map(lambda flag: str(flag).strip().lower() == 'true').astype(bool)
+    for key in ['p_success', 'payoff', 'weighted_payoff']:
+        db[key] = pd.to_numeric(db[key], errors='coerce').astype('float64')
+    return db
+
+def load_leads(blob_client):
+    """
+    Download the lead database from blob storage.
+
+    Parameters:
+    - blob_client (azure.storage.blob.BlobClient): BlobClient object where the parquet database is stored
+
+    Returns:
+    A DataFrame following LEAD_SCHEMA, with dates as datetime64 columns. Empty if the database does not exist yet.
+    """
+    if not blob_client.exists():
+        return coerce_leads(pd.DataFrame(columns=LEAD_HEADERS))
+    blob = blob_client.download_blob().readall()
+    table = pq.read_table(BytesIO(blob), schema=LEAD_SCHEMA)
+    return coerce_leads(table.to_pandas(date_as_object=False))
+
+def save_leads(blob_client, db):
+    """
+    Upload the lead database to blob storage as a zstd-compressed parquet file.
+
+    Parameters:
+    - blob_client (azure.storage.blob.BlobClient): BlobClient object where the parquet database is stored
+    - db (pd.DataFrame): The lead table
+    """
+    table = pa.Table.from_pandas(coerce_leads(db), schema=LEAD_SCHEMA, preserve_index=False)
+    buffer = BytesIO()
+    pq.write_table(table, buffer, compression='zstd')
+    blob_client.upload_blob(buffer.getvalue(), blob_type="BlockBlob", overwrite=True)
+
+def migrate_leads(blob_client, legacy_blob_client):
+    """
+    Convert a legacy csv database to the parquet format, if it has not been converted yet.
+    The csv blob is kept in place as a backup.
+
+    Parameters:
+    - blob_client (azure.storage.blob.BlobClient): BlobClient object where the parquet database is stored
+    - legacy_blob_client (azure.storage.blob.BlobClient): BlobClient object of the old csv database
+
+    Returns:
+    bool: True if a csv database was migrated, False otherwise.
+    """
+    if blob_client.exists() or not legacy_blob_client.exists():
+        return False
+    blob = legacy_blob_client.download_blob(encoding='utf8').readall()
+    db = pd.read_csv(StringIO(blob), dtype=str, keep_default_na=False, na_values=[''])
+    migrated = coerce_leads(db)
+
+    # Dates that do not follow the Day-Month-Year format cannot be parsed and are dropped
+    for key in ['contact_date', 'followup_date']:
+        if key in db:
+            unparsed = db[key].notna() & migrated[key].isna()
+            if unparsed.any():
+                logging.warning(f"{unparsed.sum()} {key} values could not be parsed and were left empty: {list(db.loc[unparsed, key].unique())}")
+
+    save_leads(blob_client, migrated)
+    logging.info(f"Migrated {len(db)} leads from {legacy_blob_client.blob_name} to {blob_client.blob_name}.")
+    return True
+
+# Aggregates of the pipeline value kept per dimension, next to the overall total
+PIPELINE_DIMENSIONS = ['contact', 'medium', 'week', 'month']
+# Dimensions that are also broken down per followup month, stored as '<dimension>_month'
+MONTHLY_DIMENSIONS = ['contact', 'medium']
+# Bumped whenever the layout of the aggregates changes, so that stored aggregates are rebuilt
+PIPELINE_VERSION = 3
+
+def _pipeline_keys(lead):
+    """
+    Return the bucket of each pipeline dimension that a lead falls in.
+    Contacts and mediums are matched ignoring case, like in the message index.
+    Weeks and months refer to the followup date, e.g. '2026-W42' and '2026-10'.
+    """
+    followup_date = lead['followup_date']
+    if pd.isna(followup_date):
+        week = month = 'unscheduled'
+    else:
+        followup_date = pd.Timestamp(followup_date)
+        year, week, _ = followup_date.isocalendar()
+        week, month = f"{year}-W{week:02d}", followup_date.strftime('%Y-%m')
+    return {'contact': 'unknown' if pd.isna(lead['contact_name']) else str(lead['contact_name']).lower(),
+            'medium': 'unknown' if pd.isna(lead['medium']) else str(lead['medium']).lower(),
+            'week': week,
+            'month': month}
+
+def update_pipeline(pipeline, lead, sign=1):
+    """
+    Add (sign=1) or remove (sign=-1) the contribution of a single lead to the pipeline aggregates.
+    A flag change is applied by removing the old version of the lead and adding the new one.
+
+    Parameters:
+    - pipeline (dict): The aggregates, as returned by load_pipeline
+    - lead (pd.Series or dict): A row of the lead table, with the dtypes of LEAD_SCHEMA
+    - sign (int): 1 to add the lead, -1 to remove it
+
+    Returns:
+    The updated pipeline dictionary
+    """
+    payoff = 0.0 if pd.isna(lead['payoff']) else float(lead['payoff'])
+    weighted_payoff = 0.0 if pd.isna(lead['weighted_payoff']) else float(lead['weighted_payoff'])
+    is_open = not bool(lead['reminder_sent'])
+    contribution = {'leads': 1,
+                    'open_leads': int(is_open),
+                    'payoff': payoff,
+                    'weighted_payoff': weighted_payoff,
+                    'open_weighted_payoff': weighted_payoff if is_open else 0.0}
+
+    # (dictionary of buckets, key) pairs of every bucket the lead falls in
+    keys = _pipeline_keys(lead)
+    groups = [(pipeline[dimension], keys[dimension]) for dimension in PIPELINE_DIMENSIONS]
+    groups += [(pipeline[f'{dimension}_month'].setdefault(keys['month'], {}), keys[dimension]) for dimension in MONTHLY_DIMENSIONS]
+
+    for bucket in [pipeline['total']] + [group.setdefault(key, {}) for group, key in groups]:
+        for field, value in contribution.items():
+            bucket[field] = bucket.get(field, 0) + sign * value
+
+    # Contact buckets keep the contact name as it was last logged, for display
+    if sign > 0 and not pd.isna(lead['contact_name']):
+        for group in [pipeline['contact'], pipeline['contact_month'][keys['month']]]:
+            group[keys['contact']]['contact_name'] = str(lead['contact_name'])
+
+    # Drop buckets that no longer hold any lead
+    for group, key in groups:
+        if group[key]['leads'] <= 0:
+            del group[key]
+    for dimension in MONTHLY_DIMENSIONS:
+        if not pipeline[f'{dimension}_month'][keys['month']]:
+            del pipeline[f'{dimension}_month'][keys['month']]
+    return pipeline
+
+def build_pipeline(db):
+    """
+    Compute the pipeline aggregates from scratch, given the full lead table.
+    'rows' records how many leads of the table the aggregates cover.
+    """
+    pipeline = {'version': PIPELINE_VERSION, 'rows': len(db), 'total': {},
+                **{dimension: {} for dimension in PIPELINE_DIMENSIONS},
+                **{f'{dimension}_month': {} for dimension in MONTHLY_DIMENSIONS}}
+    for _, lead in db.iterrows():
+        update_pipeline(pipeline, lead)
+    return pipeline
+
+def load_pipeline(pipeline_client, blob_client, db=None):
+    """
+    Download the pipeline aggregates from blob storage.
+    They are rebuilt from the lead database if they do not exist yet, if they were stored with an older layout,
+    or if their lead and open lead counts do not match the given table (e.g. after a failed upload).
+    Rebuilt aggregates are only uploaded if the lead database exists.
+
+    Parameters:
+    - pipeline_client (azure.storage.blob.BlobClient): BlobClient object where the aggregates are stored as json
+    - blob_client (azure.storage.blob.BlobClient): BlobClient object where the parquet database is stored
+    - db (pd.DataFrame, optional): The lead table, if already loaded, to check the aggregates against
+
+    Returns:
+    A dictionary with the 'total' aggregates, one dictionary of aggregates per PIPELINE_DIMENSIONS entry
+    and one dictionary of aggregates per month and key for each MONTHLY_DIMENSIONS entry
+    """
+    if pipeline_client.exists():
+        pipeline = json.loads(pipeline_client.download_blob(encoding='utf8').readall())
+        if pipeline.get('version') != PIPELINE_VERSION:
+            logging.warning("Pipeline aggregates were stored with an older layout, rebuilding.")
+        elif db is None:
+            return pipeline
+        else:
+            covered = (pipeline.get('rows'), pipeline['total'].get('open_leads', 0))
+            expected = (len(db), int((~db['reminder_sent']).sum()))
+            if covered == expected:
+                return pipeline
+            logging.warning(f"Pipeline aggregates cover {covered[0]} leads ({covered[1]} open) instead of {expected[0]} ({expected[1]} open), rebuilding.")
+
+    if db is None:
+        db = load_leads(blob_client)
+    pipeline = build_pipeline(db)
+    if blob_client.exists():
+        save_pipeline(pipeline_client, pipeline)
+        logging.info("Built pipeline aggregates from the database.")
+    return pipeline
+
+def save_pipeline(pipeline_client, pipeline):
+    """
+    Upload the pipeline aggregates to blob storage as json.
+    """
+    pipeline_client.upload_blob(json.dumps(pipeline), blob_type="BlockBlob", overwrite=True)
+
+def pipeline_summary(pipeline, by=None, key=None, month=None):
+    """
+    Look up the pipeline aggregates, without touching the lead table.
+
+    Parameters:
+    - pipeline (dict): The aggregates, as returned by load_pipeline
+    - by (str, optional): One of PIPELINE_DIMENSIONS. If not provided, the overall total is returned.
+    - key (str, optional): A single contact, medium, week ('2026-W42') or month ('2026-10') of the dimension.
+    - month (str, optional): Only count the leads with a followup in this month ('2026-10').
+      Can be combined with the MONTHLY_DIMENSIONS, or used on its own for the total of the month.
+
+    Returns:
+    A dictionary of aggregates, or a dictionary of aggregates per key if only 'by' is provided.
+    """
+    if by is None:
+        return pipeline['total'] if month is None else pipeline['month'].get(month, {})
+    if by not in PIPELINE_DIMENSIONS:
+        raise ValueError(f"Unknown pipeline dimension '{by}'. Choose between: {', '.join(PIPELINE_DIMENSIONS)}")
+    if month is None:
+        buckets = pipeline[by]
+    elif by in MONTHLY_DIMENSIONS:
+        buckets = pipeline[f'{by}_month'].get(month, {})
+    else:
+        raise ValueError(f"Pipeline dimension '{by}' cannot be filtered per month. Choose between: {', '.join(MONTHLY_DIMENSIONS)}")
+    if key is None:
+        return buckets
+    if by in ['contact', 'medium']:
+        key = key.lower()
+    return buckets.get(key, {})
+
+# Words that are too common to be worth indexing
+STOPWORDS = {'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'has', 'have', 'i', 'in', 'is', 'it',
+             'of', 'on', 'or', 'our', 'the', 'their', 'they', 'this', 'to', 'was', 'we', 'will', 'with', 'you'}
+# Number of characters of a message kept in the index to display it; the full text stays in the lead table
+SNIPPET_LENGTH = 160
+# Bumped whenever the layout of the index changes, so that stored indexes are rebuilt
+INDEX_VERSION = 2
+
+def tokenize(text):
+    """
+    Split a text into the lowercase terms used by the message index.
+    """
+    if text is None or pd.isna(text):
+        return set()
+    return {term for term in re.findall(r'\w+', str(text).lower()) if term not in STOPWORDS}
+
+def update_index(index, lead_id, lead):
+    """
+    Add a single lead to the message index: its message terms, its contact and a short entry to display it,
+    holding the first SNIPPET_LENGTH characters of the message.
+
+    Parameters:
+    - index (dict): The index, as returned by load_index
+    - lead_id (int): Position of the lead in the database
+    - lead (pd.Series or dict): A row of the lead table, with the dtypes of LEAD_SCHEMA
+
+    Returns:
+    The updated index dictionary
+    """
+    lead_id = int(lead_id)
+    contact = None if pd.isna(lead['contact_name']) else str(lead['contact_name'])
+    message = None if pd.isna(lead['message']) else str(lead['message'])
+    if message is not None and len(message) > SNIPPET_LENGTH:
+        message = message[:SNIPPET_LENGTH].rstrip() + "..."
+    for term in tokenize(lead['message']):
+        index['terms'].setdefault(term, []).append(lead_id)
+    if contact is not None:
+        index['contacts'].setdefault(contact.lower(), []).append(lead_id)
+    index['leads'][str(lead_id)] = {
+        'contact_name': contact,
+        'message': message,
+        'contact_date': None if pd.isna(lead['contact_date']) else pd.Timestamp(lead['contact_date']).strftime('%d-%m-%Y'),
+        'medium': None if pd.isna(lead['medium']) else str(lead['medium'])}
+    return index
+
+def build_index(db):
+    """
+    Build the message index from scratch, given the full lead table.
+    'rows' records how many leads of the table the index covers.
+    """
+    index = {'version': INDEX_VERSION, 'rows': len(db), 'terms': {}, 'contacts': {}, 'leads': {}}
+    for lead_id, lead in db.reset_index(drop=True).iterrows():
+        update_index(index, lead_id, lead)
+    return index
+
+def load_index(index_client, blob_client, db=None):
+    """
+    Download the message index from blob storage.
+    It is rebuilt from the lead database if it does not exist yet, if it was stored with an older layout,
+    or if it does not cover exactly the rows of the given table (e.g. after a failed upload).
+    A rebuilt index is only uploaded if the lead database exists.
+
+    Parameters:
+    - index_client (azure.storage.blob.BlobClient): BlobClient object where the index is stored as json
+    - blob_client (azure.storage.blob.BlobClient): BlobClient object where the parquet database is stored
+    - db (pd.DataFrame, optional): The lead table, if already loaded, to check the index against
+
+    Returns:
+    A dictionary with the term -> lead ids and contact -> lead ids posting lists, and an entry per lead id
+    """
+    if index_client.exists():
+        index = json.loads(index_client.download_blob(encoding='utf8').readall())
+        if index.get('version') != INDEX_VERSION:
+            logging.warning("Message index was stored with an older layout, rebuilding.")
+        elif db is None or index.get('rows') == len(db):
+            return index
+        else:
+            logging.warning(f"Message index covers {index.get('rows')} leads instead of {len(db)}, rebuilding.")
+
+    if db is None:
+        db = load_leads(blob_client)
+    index = build_index(db)
+    if blob_client.exists():
+        save_index(index_client, index)
+        logging.info("Built message index from the database.")
+    return index
+
+def save_index(index_client, index):
+    """
+    Upload the message index to blob storage as json.
+    """
+    index_client.upload_blob(json.dumps(index), blob_type="BlockBlob", overwrite=True)
+
+def search_index(index, query, limit=5):
+    """
+    Find the leads whose message contains all the keywords of the query.
+
+    Parameters:
+    - index (dict): The index, as returned by load_index
+    - query (str): The keywords to look for
+    - limit (int): The maximum number of leads to return
+
+    Returns:
+    A list of lead ids, most recently logged first
+    """
+    terms = tokenize(query)
+    if not terms:
+        return []
+    postings = sorted((index['terms'].get(term, []) for term in terms), key=len)
+    matches = set(postings[0]).intersection(*postings[1:])
+    return sorted(matches, reverse=True)[:limit]
+
+def contact_history(index, contact, limit=5, fuzzy=True):
+    """
+    Find the leads logged for a contact.
+    Exact matches (ignoring case) are prioritized, then contacts with edit distance < 3, as in match_contact.
+
+    Parameters:
+    - index (dict): The index, as returned by load_index
+    - contact (str): The contact name to look for
+    - limit (int): The maximum number of leads to return
+    - fuzzy (bool): Whether to fall back to contacts with edit distance < 3
+
+    Returns:
+    A list of the matched contact names, and a list of their lead ids, most recently logged first
+    """
+    contact = contact.strip().lower()
+    if contact in index['contacts']:
+        matches = [contact]
+    elif fuzzy:
+        matches = [name for name in index['contacts'] if editdistance.eval(name, contact) < 3]
+    else:
+        matches = []
+    lead_ids = [lead_id for name in matches for lead_id in index['contacts'][name]]
+    # Report the contact names as they were logged
+    contacts = [index['leads'][str(index['contacts'][name][-1])]['contact_name'] for name in matches]
+    return contacts, sorted(lead_ids, reverse=True)[:limit]
+
 def extract(user_input):
 
     """
@@ -58,16 +451,18 @@ def extract(user_input):
                                               response_format={"type": "json_object" }).choices[0].message.content
     return json.loads(response)
 
-def remind(blob_client, current_date=None):
+def remind(blob_client, current_date=None, pipeline_client=None):
     """
     Generate notification messages based on specified guidelines.
+    The leads that were reminded are flagged as sent in the database and in the pipeline aggregates.
 
     Parameters:
         blob_client (azure.storage.blob.BlobClient): BlobClient object where the database file containing lead information.
         current_date (str, optional): The current date and time as a reference. If not provided, the current datetime will be used.
+        pipeline_client (azure.storage.blob.BlobClient, optional): BlobClient object where the pipeline aggregates are stored.
 
     Returns:
-        bool: True if the OpenAI API call was successful, False otherwise.
+        dict: The generated reminders, reasoning and rows, or None if no reminders could be retrieved.
 
     """
     prompt = """You manage follow-up reminders for customer leads, notifying the user on scheduled days.
@@ -98,12 +493,11 @@ def remind(blob_client, current_date=None):
                     }
                     """
     # Download the database from blob storage in Azure
-    blob = blob_client.download_blob(encoding='utf8').readall()
-    blob = pd.read_csv(StringIO(blob))
+    blob = load_leads(blob_client)
     
-    # Save the database locally as a csv for OpenAI processing
+    # Save the database locally as a csv for OpenAI processing, keeping the Day-Month-Year date format
     database_path = os.path.join('data', 'clients.csv')
-    blob.to_csv(database_path, index=False, encoding ="utf-8")
+    blob.to_csv(database_path, index=False, encoding ="utf-8", date_format='%d-%m-%Y')
 
     # Upload the file to OpenAI
     db = client.files.create(file=open(database_path, "rb"),
@@ -135,6 +529,8 @@ def remind(blob_client, current_date=None):
     # Run the assistant with the thread messages
     run = client.beta.threads.runs.create(thread_id=thread.id, assistant_id=assistant.id)
     
+    output = None
+
     #Wait for the OpenAI assistant to process the prompt & file upload
     while True:
         logging.info('Give the reminder agent 10 more seconds..')
@@ -156,16 +552,39 @@ def remind(blob_client, current_date=None):
                     if msg.role == "assistant":
                         # Extract the json object from the output as openAI assistants do not support structured_responses for now
                         output = json.loads(re.search(r'\{(?:[^{}]|\\{|\\})*\}', content, re.DOTALL).group())
+                        pipeline = None
+                        if pipeline_client:
+                            try:
+                                pipeline = load_pipeline(pipeline_client, blob_client, blob)
+                            except Exception as e:
+                                # The open lead counts will no longer match, so the aggregates are rebuilt on the next update
+                                logging.warning(f"Could not load the pipeline aggregates: {e!r}")
                         try:  
-                            for row in output['rows']:
-                                blob.at[int(row), 'reminder_sent'] = True #change the database so that the reminder is marked as sent.
-                        except:
-                            logging.warning("The reminder did not generate a relevant position in the database or something else went wrong.")
+                            rows = [int(row) for row in output['rows']]
+                            for row in rows:
+                                if blob.at[row, 'reminder_sent']:
+                                    continue
+                                if pipeline is not None:
+                                    update_pipeline(pipeline, blob.loc[row], sign=-1)
+                                blob.at[row, 'reminder_sent'] = True #change the database so that the reminder is marked as sent.
+                                if pipeline is not None:
+                                    update_pipeline(pipeline, blob.loc[row])
+                        except (KeyError, ValueError, TypeError):
+                            logging.warning("The reminder did not generate a relevant position in the database.")
+                        else:
+                            try:
+                                save_leads(blob_client, blob)
+                                if pipeline is not None:
+                                    save_pipeline(pipeline_client, pipeline)
+                            except Exception as e:
+                                logging.warning(f"Could not save the sent reminders: {e!r}")
                 except:
                     # if .text does not exist (assistant did not return messages)
                     logging.warning("No assistant messages could be retrieved.")
             break
 
+    return output
+
 def format_text(recipient, text, template_name):
     """
     Formats a message as a whatsapp message according to a template
@@ -326,6 +745,60 @@ def format_dict(dictionary, keys=["contact_name", "message", "contact_date", "fo
                 formatted_string += f"\n{field}: {dictionary[key]}"
         return formatted_string
 
+def format_pipeline(pipeline, current_date=None, month=None):
+        """
+        Format the pipeline aggregates in a WhatsApp-friendly format.
+
+        Parameters:
+        - pipeline (dict): The aggregates, as returned by load_pipeline.
+        - current_date (datetime, optional): Reference for the current week and month. Defaults to today.
+        - month (str, optional): The month to break down per medium and contact, e.g. '2026-10'. Defaults to the current month.
+
+        Returns:
+        - formatted_pipeline (str): The expected value of the whole pipeline, this week, and of the month per medium and per top contact.
+        """
+        current_date = current_date if current_date else datetime.today()
+        year, week, _ = current_date.isocalendar()
+        month = month if month else current_date.strftime('%Y-%m')
+
+        def line(name, aggregates):
+            return (f"\n- {name}: {aggregates.get('weighted_payoff', 0):.2f} expected "
+                    f"({aggregates.get('open_weighted_payoff', 0):.2f} open, {aggregates.get('leads', 0)} leads)")
+
+        formatted_pipeline = "Pipeline summary:"
+        formatted_pipeline += line("Total", pipeline_summary(pipeline))
+        formatted_pipeline += line("Followups this week", pipeline_summary(pipeline, 'week', f"{year}-W{week:02d}"))
+        formatted_pipeline += line(f"Followups in {month}", pipeline_summary(pipeline, month=month))
+
+        formatted_pipeline += f"\n\nBy medium in {month}:"
+        for medium, aggregates in pipeline_summary(pipeline, 'medium', month=month).items():
+            formatted_pipeline += line(medium.capitalize(), aggregates)
+
+        formatted_pipeline += f"\n\nTop contacts in {month}:"
+        contacts = sorted(pipeline_summary(pipeline, 'contact', month=month).items(), key=lambda item: item[1]['weighted_payoff'], reverse=True)
+        for contact, aggregates in contacts[:5]:
+            formatted_pipeline += line(aggregates.get('contact_name', contact), aggregates)
+        return formatted_pipeline
+
+def format_history(index, lead_ids):
+        """
+        Format the leads found in the message index in a WhatsApp-friendly format.
+
+        Parameters:
+        - index (dict): The index, as returned by load_index.
+        - lead_ids (List[int]): The lead ids to display, as returned by search_index or contact_history.
+
+        Returns:
+        - formatted_history (str): One paragraph per lead with its contact, date, medium and message.
+        """
+        if not lead_ids:
+            return "No logged messages found."
+        formatted_history = "Logged messages:"
+        for lead_id in lead_ids:
+            lead = index['leads'][str(lead_id)]
+            formatted_history += f"\n\n{lead['contact_name']} ({lead['contact_date']}, {lead['medium']}):\n{lead['message']}"
+        return formatted_history
+
 def format_reminder(output):
         """
         Format the reminders and the reasoning generated from the reminder model.
@@ -7,13 +7,12 @@ import requests
 import dateparser
 import editdistance
 import pandas as pd
-from io import StringIO
 from datetime import date
 from dotenv import load_dotenv
 from dataclasses import dataclass
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, HTTPException
 from azure.storage.blob import BlobServiceClient, BlobClient
-from crm_utils import extract, remind, format_text, format_dict, format_reminder
+from crm_utils import extract, remind, format_text, format_dict, format_reminder, format_pipeline, coerce_leads, load_leads, save_leads, migrate_leads, load_pipeline, save_pipeline, update_pipeline, pipeline_summary, format_history, load_index, save_index, update_index, search_index, contact_history
 
 app = FastAPI()
 messages = []
@@ -38,6 +37,23 @@ variables = [
 ]
 config = {var: os.getenv(var) for var in variables}
 
+# Text commands offered next to the buttons of the initiate template
+commands = """You can also type:
+- 'pipeline' or 'pipeline <YYYY-MM>' for the expected value of your leads
+- 'history <contact>' for your last messages with a contact
+- 'search <keywords>' for messages mentioning these keywords"""
+
+def get_blob_client(extension):
+    """
+    Returns the BlobClient of the recipient's file with the given extension, e.g. '.parquet'
+    """
+    try:
+        blob_service_client = BlobServiceClient.from_connection_string(config['CONNECTION_STRING'])
+        container_client = blob_service_client.get_container_client("clients")
+        return container_client.get_blob_client(f"{config['RECIPIENT_WAID']}{extension}")
+    except:
+        raise Exception("Could not establish connection with BlobServiceClient")
+
 @app.get("/") 
 async def root():
     return {"Nothing to see here. Make a request to the /crm endpoint to run the CRM app."}
@@ -85,6 +101,22 @@ async def get_messages():
     messages = []
     return stored_messages
 
+@app.get("/pipeline")
+async def get_pipeline(by: str = None, key: str = None, month: str = None):
+    """
+    Returns the expected pipeline value from the incrementally maintained aggregates.
+    Use 'by' to group per contact, medium, week or month, and 'key' to select a single group.
+    Use 'month' (e.g. '2026-10') to only count the followups of that month, per contact or medium.
+    """
+    blob_client = get_blob_client(".parquet")
+    # Convert databases created before the parquet format, so that their leads are aggregated
+    migrate_leads(blob_client, get_blob_client(".csv"))
+    pipeline = load_pipeline(get_blob_client("_pipeline.json"), blob_client)
+    try:
+        return pipeline_summary(pipeline, by, key, month)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 async def send(session, message, template_name="simple"):
     """
     Sends a message using the Facebook Graph API.
@@ -244,14 +276,17 @@ async def main():
         else:
             return None
 
-    async def write_to_db(blob_client, lead):
+    async def write_to_db(blob_client, pipeline_client, index_client, lead):
         """
         Add a new row to the database given a lead object. If the db does not exist, it is created
         This function calls match_contact to compare the contact_name value to previously logged names.
+        The pipeline aggregates and the message index are updated with the new row.
 
         Args:
             session: aiohttp.ClientSession object for sending status messages to the server.
-            blob_client (azure.storage.blob.BlobClient): BlobClient object where the user csv is stored
+            blob_client (azure.storage.blob.BlobClient): BlobClient object where the user parquet database is stored
+            pipeline_client (azure.storage.blob.BlobClient): BlobClient object where the pipeline aggregates are stored
+            index_client (azure.storage.blob.BlobClient): BlobClient object where the message index is stored
             lead (dict): Dictionary containing the attributes of the Lead dataclass
         
         Returns:
@@ -259,22 +294,20 @@ async def main():
         """
 
 
-        # Define headers
-        headers = ['contact_name', 'message', 'contact_date', 'followup_date', 'followup_time', 'reminder_sent', 'medium', 'p_success', 'payoff', 'weighted_payoff']
-        # Download existing database
-        try:
-            blob = blob_client.download_blob(encoding='utf8').readall()
-            db = pd.read_csv(StringIO(blob))
+        # Download existing database, its pipeline aggregates and message index
+        db = load_leads(blob_client)
+        pipeline = load_pipeline(pipeline_client, blob_client, db)
+        index = load_index(index_client, blob_client, db)
+        if len(db):
             logging.info("Retrieved database.")
             # Check if the cotnact already exists
-            existing_contacts = list(set(db['contact_name']))
+            existing_contacts = list(set(db['contact_name'].dropna()))
             #contact = await match_contact(session, existing_contacts, lead['contact_name']
             logging.info(f"Found contacts: {existing_contacts}")
             contact = lead['contact_name'] #edit: call match_contact instead 
 
         # In case the databse does not exist yet
-        except:
-            db = pd.DataFrame(columns = headers)
+        else:
             logging.info("Creating new database.")
             contact = lead['contact_name']
 
@@ -291,16 +324,23 @@ async def main():
             'weighted_payoff': lead['payoff'] * lead['p_success']
         }
         
-        # Append data to the databse
-        db.loc[len(db)] = data
+        # Append data to the databse, parsing the Day-Month-Year dates into typed columns
+        row = coerce_leads(pd.DataFrame([data]))
+        db = pd.concat([db, row], ignore_index=True) if len(db) else row
         logging.info(db)
-        # Convert to csv file
-        blob = db.to_csv(index=False, encoding = "utf-8")
-        # Upload to the blob storage
-        blob_client.upload_blob(blob, blob_type="BlockBlob", overwrite=True)
+        # Upload to the blob storage as parquet
+        save_leads(blob_client, db)
+        # Add the new lead to the pipeline aggregates
+        update_pipeline(pipeline, row.iloc[0])
+        pipeline['rows'] = len(db)
+        save_pipeline(pipeline_client, pipeline)
+        # Add the new lead to the message index under its position in the database
+        update_index(index, len(db) - 1, row.iloc[0])
+        index['rows'] = len(db)
+        save_index(index_client, index)
         logging.info("Upload successful.")
 
-    async def crm(session, blob_client):
+    async def crm(session, blob_client, pipeline_client, index_client):
         "Adding new information in the database"
         while True:
             # Inform the user of the tracked informations
@@ -321,7 +361,7 @@ async def main():
             if user_info == 'Confirm_button':
                 logging.info("Confirmed")
                 await send(session, "Your database has been updated. Have a good day!", template_name="simple")
-                await write_to_db(blob_client, vars(curr_lead))
+                await write_to_db(blob_client, pipeline_client, index_client, vars(curr_lead))
 
                 break
 
@@ -334,30 +374,89 @@ async def main():
                 output = extract(user_info)
                 await curr_lead.update(output)
 
+    async def history(session, index, query):
+        """
+        Look up logged messages, either by contact or by keywords.
+        'history <contact>' and 'search <keywords>' go straight to the respective lookup, where contacts may be misspelled.
+        Otherwise the user is asked for a query, which is matched exactly to a contact first and to keywords second.
+
+        Args:
+            session: aiohttp.ClientSession object.
+            index (dict): The message index, as returned by load_index.
+            query (str): The user's command.
+
+        Returns:
+            None
+        """
+        # Split off the command on any whitespace, e.g. 'history\nAcme'
+        command, query = (query.split(None, 1) + ["", ""])[:2]
+        command, query = command.lower(), query.strip()
+
+        if not query:
+            await send(session, "Which contact or keywords are you looking for?", template_name="cancel_option")
+            reply = await receive(session)
+            if reply == 'Cancel_button':
+                logging.info("Cancelled")
+                return
+
+            # The reply may repeat the command, e.g. 'search pricing'
+            words = reply.split(None, 1)
+            if len(words) == 2 and words[0].lower() in ['history', 'search']:
+                command, query = words[0].lower(), words[1].strip()
+            else:
+                command, query = None, reply.strip()
+
+        if command == 'search':
+            contacts, lead_ids = [], search_index(index, query)
+        elif command == 'history':
+            contacts, lead_ids = contact_history(index, query)
+        else:
+            # Short keywords are often close to some contact name, so only exact contact matches are used here
+            contacts, lead_ids = contact_history(index, query, fuzzy=False)
+            if not lead_ids:
+                contacts, lead_ids = [], search_index(index, query)
+
+        if contacts:
+            await send(session, f"Matched contact: {', '.join(contacts)}")
+        await send(session, format_history(index, lead_ids))
+
 # Main Conversation Loop
     async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=200)) as session:
-        try:
-            blob_service_client = BlobServiceClient.from_connection_string(config['CONNECTION_STRING'])
-            container_client = blob_service_client.get_container_client("clients")
-            blob_client = container_client.get_blob_client(f"{config['RECIPIENT_WAID']}.csv")
-        except:
-            raise Exception("Could not establish connection with BlobServiceClient")
+        blob_client = get_blob_client(".parquet")
+        legacy_blob_client = get_blob_client(".csv")
+        pipeline_client = get_blob_client("_pipeline.json")
+        index_client = get_blob_client("_index.json")
+
+        # Convert databases created before the parquet format
+        migrate_leads(blob_client, legacy_blob_client)
 
         await send(session, "", template_name="initiate") 
+        await send(session, commands)
         
         user = await receive(session)
 
         if user == 'Add_button':
-             await crm(session, blob_client)
+             await crm(session, blob_client, pipeline_client, index_client)
 
         #function = "Retrieve reminders"
         elif user == 'Retrieve_button':
-            output = remind(blob_client) 
+            output = remind(blob_client, pipeline_client=pipeline_client) 
             reminder = format_reminder(output)
             logging.info(reminder)
             await send(session, reminder)
+
+        #function = "Pipeline summary", sent as a text command
+        elif user.split() and user.split()[0].lower() == 'pipeline':
+            pipeline = load_pipeline(pipeline_client, blob_client)
+            month = user.split()[1] if len(user.split()) > 1 else None
+            await send(session, format_pipeline(pipeline, month=month))
+
+        #function = "Message history", sent as a text command
+        elif user.split() and user.split()[0].lower() in ['history', 'search']:
+            index = load_index(index_client, blob_client)
+            await history(session, index, user)
         else:
-            await send(session, "Invalid request. Start a new session.")
+            await send(session, f"Invalid request. Start a new session.\n{commands}")
 
 uvicorn.run(app, host="0.0.0.0", port=8000)
 